@@ -0,0 +1,222 @@
+"""
+Export vidéo d'une bobine capturée (répertoire de %04d.jpg).
+
+La bobine est découpée en tranches de CHUNK_FRAMES images encodées en
+parallèle par des processus ffmpeg locaux (au plus WorkerPools.export_slots
+à la fois pour tout le service), puis les tranches sont concaténées sans
+réencodage. Tant qu'une capture est en cours sur une machine, les processus
+ffmpeg sont suspendus (SIGSTOP) et aucune tranche ne démarre.
+"""
+
+import asyncio
+import os
+import shutil
+import signal
+import uuid
+from typing import Callable, Optional
+
+CHUNK_FRAMES = 500
+THROTTLE_POLL = 0.5     # Vérification de l'activité de capture (s)
+NICE = 10
+
+# États d'un export
+EXPORT_PENDING = "pending"
+EXPORT_RUNNING = "running"
+EXPORT_DONE = "done"
+EXPORT_FAILED = "failed"
+EXPORT_CANCELLED = "cancelled"
+
+
+def count_frames(directory: str) -> int:
+    """Nombre d'images d'une bobine: journal frames.bin si présent, sinon les fichiers."""
+    if os.path.exists(os.path.join(directory, "frames.bin")):
+        from framestore import FrameStore
+        return FrameStore(directory).count
+
+    count = 0
+    while os.path.exists(os.path.join(directory, f"{count + 1:04d}.jpg")):
+        count += 1
+    return count
+
+
+def _lower_priority() -> None:
+    os.nice(NICE)
+
+
+class ExportJob:
+    """Encodage d'une plage d'images d'une bobine en un fichier vidéo."""
+
+    def __init__(
+        self,
+        directory: str,
+        output: str,
+        fps: int,
+        slots: asyncio.Semaphore,
+        capture_busy: Callable[[], bool],
+        first: int = 1,
+        last: Optional[int] = None,
+    ):
+        self.id = uuid.uuid4().hex[:8]
+        self.directory = directory
+        self.output = output
+        self.fps = fps
+        self.first = first
+        self.last = last
+        self.state = EXPORT_PENDING
+        self.error: Optional[str] = None
+        self.throttled = False
+        self._slots = slots
+        self._capture_busy = capture_busy
+        self._chunks: list[tuple[int, int]] = []
+        self._progress: dict[int, int] = {}        # Images encodées par tranche
+        self._done_chunks = 0
+        self._procs: set[asyncio.subprocess.Process] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    def cancel(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def wait(self) -> None:
+        """Attend la fin de l'export (processus ffmpeg terminés)."""
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def run(self) -> None:
+        self.state = EXPORT_RUNNING
+        work_dir = self.output + ".chunks"
+        throttle = asyncio.get_running_loop().create_task(self._throttle())
+        try:
+            if shutil.which("ffmpeg") is None:
+                raise RuntimeError("ffmpeg introuvable")
+
+            last = self.last or await asyncio.to_thread(count_frames, self.directory)
+            if last < self.first:
+                raise RuntimeError("Aucune image à exporter")
+            self._chunks = [
+                (start, min(start + CHUNK_FRAMES - 1, last))
+                for start in range(self.first, last + 1, CHUNK_FRAMES)
+            ]
+
+            os.makedirs(work_dir, exist_ok=True)
+            files = [os.path.join(work_dir, f"chunk_{i:04d}.mp4") for i in range(len(self._chunks))]
+            tasks = [
+                asyncio.ensure_future(self._encode_chunk(i, chunk, path))
+                for i, (chunk, path) in enumerate(zip(self._chunks, files))
+            ]
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            finally:
+                # Annulation ou échec d'une tranche: arrêter les autres et
+                # attendre la fin de leurs processus ffmpeg
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            errors = [t.exception() for t in tasks if not t.cancelled() and t.exception()]
+            if errors:
+                raise errors[0]
+            await self._concat(files, work_dir)
+            self.state = EXPORT_DONE
+        except asyncio.CancelledError:
+            # Les processus ffmpeg sont déjà tués (voir _run_ffmpeg)
+            self.state = EXPORT_CANCELLED
+            raise
+        except (OSError, RuntimeError) as e:
+            self.state = EXPORT_FAILED
+            self.error = str(e)
+            print(f"[ERROR] Export {self.id}: {e}")
+        finally:
+            throttle.cancel()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def _run_ffmpeg(self, args: list[str], chunk: Optional[int] = None) -> None:
+        """Lance ffmpeg (priorité basse) et suit sa progression (-progress pipe:1)."""
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-progress", "pipe:1", *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            preexec_fn=_lower_priority,
+        )
+        self._procs.add(proc)
+        if self.throttled:
+            proc.send_signal(signal.SIGSTOP)
+        try:
+            async for line in proc.stdout:
+                key, _, value = line.decode().strip().partition("=")
+                if key == "frame" and chunk is not None:
+                    self._progress[chunk] = int(value)
+            stderr = await proc.stderr.read()
+            if await proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg: {stderr.decode().strip()[-200:]}")
+        except asyncio.CancelledError:
+            # SIGKILL termine aussi un processus suspendu (SIGSTOP); attendre
+            # sa fin avant que run() supprime le répertoire de travail
+            if proc.returncode is None:
+                proc.kill()
+            await proc.wait()
+            raise
+        finally:
+            self._procs.discard(proc)
+
+    async def _encode_chunk(self, index: int, chunk: tuple[int, int], path: str) -> None:
+        first, last = chunk
+        async with self._slots:
+            # Pas de nouvelle tranche pendant une capture
+            while self._capture_busy():
+                await asyncio.sleep(THROTTLE_POLL)
+            await self._run_ffmpeg([
+                "-framerate", str(self.fps),
+                "-start_number", str(first),
+                "-i", os.path.join(self.directory, "%04d.jpg"),
+                "-frames:v", str(last - first + 1),
+                "-c:v", "libx264", "-preset", "medium", "-crf", "18",
+                "-pix_fmt", "yuv420p",
+                path,
+            ], chunk=index)
+        self._progress[index] = last - first + 1
+        self._done_chunks += 1
+
+    async def _concat(self, files: list[str], work_dir: str) -> None:
+        """Concaténation sans réencodage (démultiplexeur concat)."""
+        listing = os.path.join(work_dir, "chunks.txt")
+        with open(listing, "w") as f:
+            for path in files:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        os.makedirs(os.path.dirname(os.path.abspath(self.output)), exist_ok=True)
+        await self._run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", listing,
+            "-c", "copy", "-movflags", "+faststart",
+            self.output,
+        ])
+
+    async def _throttle(self) -> None:
+        """Suspend les processus ffmpeg pendant les captures."""
+        while True:
+            busy = self._capture_busy()
+            if busy != self.throttled:
+                self.throttled = busy
+                sig = signal.SIGSTOP if busy else signal.SIGCONT
+                for proc in self._procs:
+                    if proc.returncode is None:
+                        proc.send_signal(sig)
+            await asyncio.sleep(THROTTLE_POLL)
+
+    def to_dict(self) -> dict:
+        total = sum(last - first + 1 for first, last in self._chunks)
+        return {
+            "id": self.id,
+            "directory": self.directory,
+            "output": self.output,
+            "fps": self.fps,
+            "state": self.state,
+            "frames_done": sum(self._progress.values()),
+            "frames_total": total,
+            "chunks_done": self._done_chunks,
+            "chunks_total": len(self._chunks),
+            "throttled": self.throttled,
+            "error": self.error,
+        }
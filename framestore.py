@@ -0,0 +1,185 @@
+"""
+Métadonnées par image d'une bobine, stockées en colonnes de largeur fixe.
+
+Le fichier frames.bin d'une bobine est un tableau NumPy structuré projeté en
+mémoire (memmap): la ligne i décrit l'image n° i + 1 (fichier %04d.jpg).
+Le fichier grandit par blocs de CHUNK_ROWS lignes; l'écriture d'une image
+n'alloue aucun objet Python par image et les requêtes ne lisent que la
+plage demandée, quelle que soit la longueur de la bobine.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+FRAME_DTYPE = np.dtype([
+    ("edge_time", "<f8"),       # Front capteur (s, epoch)
+    ("interval", "<f4"),        # Depuis le front précédent (s)
+    ("exposure", "<u4"),        # Temps d'exposition (µs)
+    ("gain", "<f4"),            # Gain analogique
+    ("crop", "<u4", (4,)),      # ScalerCrop (x, y, w, h)
+    ("size", "<u4"),            # Taille du fichier JPEG (octets)
+    ("hash", "<u8"),            # blake2b 64 bits du JPEG
+    ("flags", "<u2"),
+])
+
+# Drapeaux
+FLAG_VALID = 1      # Image écrite sur disque
+FLAG_BLANK = 2      # Image vide (fin de film)
+
+# Colonnes scalaires interrogeables
+NUMERIC_FIELDS = ("edge_time", "interval", "exposure", "gain", "size", "flags")
+
+CHUNK_ROWS = 16384
+MAX_PAGE = 2000     # Images par appel à frames() (pagination via first/last)
+FILENAME = "frames.bin"
+
+
+class FrameStore:
+    """Tableau de métadonnées d'une bobine, indexé par numéro d'image (1..n)."""
+
+    def __init__(self, directory: str, writable: bool = False, truncate: bool = False):
+        self.path = os.path.join(directory, FILENAME)
+        self._writable = writable
+        self._data: Optional[np.memmap] = None
+        self._capacity = 0
+        self.count = 0
+
+        if writable:
+            os.makedirs(directory, exist_ok=True)
+            if truncate or not os.path.exists(self.path):
+                open(self.path, "wb").close()
+        self._map()
+        self.count = self._valid_prefix()
+
+    def _map(self) -> None:
+        rows = os.path.getsize(self.path) // FRAME_DTYPE.itemsize
+        if rows == 0:
+            self._data = np.zeros(0, dtype=FRAME_DTYPE)
+        else:
+            mode = "r+" if self._writable else "r"
+            self._data = np.memmap(self.path, dtype=FRAME_DTYPE, mode=mode, shape=(rows,))
+        self._capacity = rows
+        # Vues par colonne: l'écriture d'un champ n'alloue pas de ligne
+        self._cols = {name: self._data[name] for name in FRAME_DTYPE.names}
+
+    def _valid_prefix(self) -> int:
+        """Nombre d'images valides en tête de fichier (recherche dichotomique)."""
+        flags = self._cols["flags"]
+        lo, hi = 0, self._capacity
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if flags[mid] & FLAG_VALID:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _reserve(self, row: int) -> None:
+        if row < self._capacity:
+            return
+        if isinstance(self._data, np.memmap):
+            self._data.flush()
+        rows = (row // CHUNK_ROWS + 1) * CHUNK_ROWS
+        with open(self.path, "r+b") as f:
+            f.truncate(rows * FRAME_DTYPE.itemsize)
+        self._map()
+
+    # =========== ÉCRITURE ===========
+
+    def record_edge(
+        self,
+        frame: int,
+        edge_time: float,
+        interval: float,
+        exposure: int = 0,
+        gain: float = 0.0,
+        crop: tuple = (0, 0, 0, 0),
+    ) -> None:
+        """Enregistre le front capteur et les réglages caméra de l'image n° frame."""
+        row = frame - 1
+        self._reserve(row)
+        cols = self._cols
+        cols["edge_time"][row] = edge_time
+        cols["interval"][row] = interval
+        cols["exposure"][row] = exposure
+        cols["gain"][row] = gain
+        cols["crop"][row] = crop
+
+    def record_file(self, frame: int, size: int, digest: int, flags: int = 0) -> None:
+        """Enregistre le fichier écrit; l'image devient valide."""
+        row = frame - 1
+        self._reserve(row)
+        cols = self._cols
+        cols["size"][row] = size
+        cols["hash"][row] = digest
+        cols["flags"][row] = flags | FLAG_VALID
+        # Les écritures peuvent se terminer dans le désordre
+        column = cols["flags"]
+        while self.count < self._capacity and column[self.count] & FLAG_VALID:
+            self.count += 1
+
+    def flush(self) -> None:
+        if isinstance(self._data, np.memmap):
+            self._data.flush()
+
+    # =========== REQUÊTES ===========
+
+    def _column(self, field: str, numeric: bool = True) -> np.ndarray:
+        if field not in (NUMERIC_FIELDS if numeric else FRAME_DTYPE.names):
+            raise ValueError(f"Unknown field: {field}")
+        return self._cols[field]
+
+    def _values(self, field: str, first: int, last: Optional[int]) -> np.ndarray:
+        values = self._column(field)[self._slice(first, last)]
+        if field == "interval":
+            # Le premier front d'une séquence n'a pas d'intervalle
+            values = values[values > 0]
+        return values
+
+    def _slice(self, first: int, last: Optional[int]) -> slice:
+        """Plage de lignes pour les images first..last (incluses)."""
+        last = self.count if last is None else min(last, self.count)
+        return slice(max(first, 1) - 1, max(last, 0))
+
+    def frames(self, first: int = 1, last: Optional[int] = None,
+               fields: Optional[list[str]] = None) -> dict:
+        """
+        Colonnes demandées pour les images first..last, au plus MAX_PAGE images:
+        "last" du résultat indique où reprendre. Le hash est en hexadécimal
+        (un u64 n'est pas représentable exactement en JSON/JavaScript).
+        """
+        first = max(first, 1)
+        last = first + MAX_PAGE - 1 if last is None else min(last, first + MAX_PAGE - 1)
+        rows = self._slice(first, last)
+        fields = fields or list(FRAME_DTYPE.names)
+        result = {"first": rows.start + 1, "last": rows.stop}
+        for name in fields:
+            values = self._column(name, numeric=False)[rows]
+            if name == "hash":
+                result[name] = [f"{value:016x}" for value in values.tolist()]
+            else:
+                result[name] = values.tolist()
+        return result
+
+    def histogram(self, field: str, first: int = 1, last: Optional[int] = None,
+                  bins: int = 50) -> dict:
+        """Histogramme d'une colonne sur les images first..last."""
+        values = self._values(field, first, last)
+        counts, edges = np.histogram(values, bins=bins)
+        return {"counts": counts.tolist(), "edges": edges.tolist()}
+
+    def stats(self, field: str, first: int = 1, last: Optional[int] = None) -> dict:
+        """Agrégats d'une colonne sur les images first..last."""
+        values = self._values(field, first, last)
+        if len(values) == 0:
+            return {"count": 0}
+        values = values.astype(np.float64)
+        return {
+            "count": int(len(values)),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": float(values.mean()),
+            "std": float(values.std()),
+        }
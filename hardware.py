@@ -4,37 +4,92 @@ Gère le GPIO (LED, moteur pas-à-pas) et la caméra (picamera2).
 """
 
 import asyncio
+import hashlib
+import importlib.util
 import io
 import os
-from typing import Optional
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from dataclasses import dataclass, fields
+from typing import Callable, Optional
+
+import hwtrace
+
+from jobs import (
+    CaptureJob, JobQueue, JOB_DONE, JOB_FAILED, JOB_PENDING, JOB_RUNNING,
+    END_COMPLETE, END_ERROR, END_OF_FILM, END_STOPPED,
+)
+from position import PositionTracker
 
 # Détection du mode mock (hors Raspberry Pi)
+# picamera2 est lourd à importer: on vérifie seulement sa présence ici,
+# l'import réel est fait au démarrage de la caméra (voir _open_camera).
 MOCK_MODE = False
 try:
     import RPi.GPIO as gpio
-    from picamera2 import Picamera2
 except ImportError:
-    MOCK_MODE = True
     gpio = None
-    Picamera2 = None
 
-print(f"[DEBUG] MOCK_MODE = {MOCK_MODE}")
+if gpio is None or importlib.util.find_spec("picamera2") is None:
+    MOCK_MODE = True
+
+# Répertoire de capture (en mode mock, un répertoire local)
+if MOCK_MODE:
+    CAPTURE_DIR = "./capture"
+else:
+    CAPTURE_DIR = "/mnt/Super8/capture"
+
+# États de la caméra
+CAMERA_INITIALIZING = "initializing"
+CAMERA_READY = "ready"
+CAMERA_ERROR = "error"
+
+
+@dataclass(frozen=True)
+class PinMap:
+    """Configuration GPIO (BCM) d'une machine."""
+    step: int = 18      # PWM moteur
+    dir: int = 7        # Direction (0=AV, 1=AR)
+    enable: int = 25    # Activer pilote moteur
+    capture: int = 17   # Capteur rotation
+    led: int = 14       # Éclairage LED
+    ms1: int = 9        # Microstepping
+    ms2: int = 10
+    ms3: int = 11
+
+    def all(self) -> list[int]:
+        return [getattr(self, f.name) for f in fields(self)]
+
+
+class WorkerPools:
+    """
+    Pools de threads partagés par toutes les machines du service:
+    encodage JPEG et écriture disque. Une seule file par pool, donc
+    le CPU et le disque sont répartis équitablement entre machines.
+    Les exports vidéo se partagent export_slots processus ffmpeg et
+    s'effacent tant qu'active_captures est non nul (voir export.py).
+    """
+
+    def __init__(self, encoders: Optional[int] = None, writers: int = 2):
+        encoders = encoders or max(1, (os.cpu_count() or 2) - 1)
+        self.encoder = ThreadPoolExecutor(encoders, thread_name_prefix="encoder")
+        self.storage = ThreadPoolExecutor(writers, thread_name_prefix="storage")
+        self.export_slots = asyncio.Semaphore(encoders)
+        self.active_captures = 0
+
+    def capture_busy(self) -> bool:
+        return self.active_captures > 0
+
+    def shutdown(self) -> None:
+        self.encoder.shutdown(wait=True)
+        self.storage.shutdown(wait=True)
 
 
 class Super8Controller:
     """Contrôleur non-bloquant pour la machine Super8."""
 
-    # Configuration GPIO (BCM)
-    STEP_PIN = 18      # PWM moteur
-    DIR_PIN = 7        # Direction (0=AV, 1=AR)
-    ENABLE_PIN = 25    # Activer pilote moteur
-    CAPTURE_PIN = 17   # Capteur rotation
-    LED_PIN = 14       # Éclairage LED
-    MS1_PIN = 9        # Microstepping
-    MS2_PIN = 10
-    MS3_PIN = 11
-
     # Configuration caméra
     RESOLUTION = (720, 576)
     DEFAULT_ZOOM = 0.410
@@ -43,13 +98,58 @@ class Super8Controller:
 
     # Configuration moteur
     PWM_FREQ = 3000    # Fréquence PWM
-
-    def __init__(self):
+    STEPS_PER_FRAME = 3200   # Pas (micro-pas) par image, pour la dérive
+    SETTLE_TIME = 0.05       # Attente du dernier front après arrêt moteur
+    LEADER_SIZE_RATIO = 2.0  # Image de film > 2x la taille JPEG de l'amorce
+
+    # Détection fin de film
+    EDGE_TIMEOUT = 5.0       # Secondes sans front capteur
+    BLANK_SIZE_RATIO = 0.25  # JPEG < 25% de la taille moyenne = image vide
+    BLANK_FRAMES = 24        # Images vides consécutives
+    MOCK_REEL_LENGTH = 20    # Longueur de bobine simulée (mode mock)
+    MOCK_SHOT_LENGTH = 8     # Longueur des plans simulés (mode mock)
+
+    # Écritures d'images en attente avant de ralentir la boucle de capture
+    MAX_PENDING_WRITES = 8
+    JOB_SAVE_INTERVAL = 2.0  # Sauvegarde de la progression pendant une capture (s)
+
+    def __init__(
+        self,
+        capture_dir: str,
+        pins: PinMap = PinMap(),
+        camera_num: int = 0,
+        pools: Optional[WorkerPools] = None,
+        simulate: bool = False,
+        steps_per_frame: Optional[int] = None,
+        gpio_backend=None,
+        camera_factory: Optional[Callable] = None,
+        trace_dir: Optional[str] = None,
+    ):
+        """
+        pools est partagé entre machines (voir units.py); simulate force le
+        mode mock pour cette machine. gpio_backend/camera_factory remplacent
+        RPi.GPIO/Picamera2 (rejeu de trace, voir hwtrace.py). trace_dir
+        active l'enregistrement.
+        steps_per_frame: pas moteur par image, pour le calcul de dérive
+        (STEPS_PER_FRAME par défaut).
+        """
+        self._capture_dir = capture_dir
+        self._pins = pins
+        self._camera_num = camera_num
+        self._pools = pools or WorkerPools()
+        self._gpio = gpio_backend or gpio
+        self._mock = simulate or (MOCK_MODE and gpio_backend is None)
+        self._camera_factory = camera_factory
+        self._trace_dir = trace_dir
+        self._trace: Optional[hwtrace.TraceRecorder] = None
         self._led_state = False
         self._zoom = self.DEFAULT_ZOOM
         self._pan_h = self.DEFAULT_PAN_H
         self._pan_v = self.DEFAULT_PAN_V
-        self._frame_position = 0
+        self._position = PositionTracker(
+            os.path.join(capture_dir, "position.json"),
+            steps_per_frame or self.STEPS_PER_FRAME,
+        )
 
         # État capture
         self._capture_active = False
@@ -58,80 +158,166 @@ class Super8Controller:
         self._stop_requested = False
         self._capture_task: Optional[asyncio.Task] = None
         self._last_error: Optional[str] = None
+        self._edge_time = 0.0       # time.monotonic() du dernier front capteur
+        self._manual_moves = 0      # Avance/recul/recalage en cours (imbriqués)
 
         # Hardware
         self._pwm = None
         self._camera = None
         self._sensor_size = None
         self._initialized = False
+        self._camera_state = CAMERA_INITIALIZING
+        self._camera_task: Optional[asyncio.Task] = None
+
+        # File de travaux
+        self.jobs = JobQueue(os.path.join(capture_dir, "jobs.json"))
+        self._queue_task: Optional[asyncio.Task] = None
+        self._queue_wakeup = asyncio.Event()
+        self._current_job: Optional[CaptureJob] = None
+        self._immediate_job: Optional[CaptureJob] = None
+        self._job_saved_at = 0.0
+
+        # Exports vidéo (voir export.py)
+        self.exports: dict = {}
 
     def initialize(self) -> None:
-        """Initialise le GPIO et la caméra."""
-        if MOCK_MODE:
+        """
+        Initialise le GPIO (phase rapide, sans caméra).
+        La caméra est démarrée en tâche de fond par start_camera().
+        """
+        if self._mock:
             print("[MOCK] Hardware initialization skipped")
             self._initialized = True
             return
 
         # Configuration GPIO
-        gpio.setmode(gpio.BCM)
-        gpio.setwarnings(False)
-
-        gpio.setup(self.ENABLE_PIN, gpio.OUT)
-        gpio.setup(self.STEP_PIN, gpio.OUT)
-        gpio.setup(self.CAPTURE_PIN, gpio.IN)
-        gpio.setup(self.DIR_PIN, gpio.OUT)
-        gpio.setup(self.LED_PIN, gpio.OUT)
-        gpio.setup(self.MS1_PIN, gpio.OUT)
-        gpio.setup(self.MS2_PIN, gpio.OUT)
-        gpio.setup(self.MS3_PIN, gpio.OUT)
+        self._gpio.setmode(self._gpio.BCM)
+        self._gpio.setwarnings(False)
+
+        self._gpio.setup(self._pins.enable, self._gpio.OUT)
+        self._gpio.setup(self._pins.step, self._gpio.OUT)
+        self._gpio.setup(self._pins.capture, self._gpio.IN)
+        self._gpio.setup(self._pins.dir, self._gpio.OUT)
+        self._gpio.setup(self._pins.led, self._gpio.OUT)
+        self._gpio.setup(self._pins.ms1, self._gpio.OUT)
+        self._gpio.setup(self._pins.ms2, self._gpio.OUT)
+        self._gpio.setup(self._pins.ms3, self._gpio.OUT)
 
         # Microstepping configuration
-        gpio.output(self.MS1_PIN, 0)
-        gpio.output(self.MS2_PIN, 1)
-        gpio.output(self.MS3_PIN, 1)
+        self._gpio.output(self._pins.ms1, 0)
+        self._gpio.output(self._pins.ms2, 1)
+        self._gpio.output(self._pins.ms3, 1)
 
         # Désactiver le moteur au démarrage
-        gpio.output(self.ENABLE_PIN, 1)
-        gpio.output(self.LED_PIN, 0)
+        self._gpio.output(self._pins.enable, 1)
+        self._gpio.output(self._pins.led, 0)
+
+        # Trace matérielle (voir hwtrace.py)
+        if self._trace_dir:
+            self._trace = hwtrace.TraceRecorder(os.path.join(
+                self._trace_dir,
+                f"trace-{datetime.now():%Y%m%d-%H%M%S}.bin"
+            ))
+            self._trace.record(hwtrace.PWM_FREQ, self._pins.step, self.PWM_FREQ)
 
         # PWM
-        self._pwm = gpio.PWM(self.STEP_PIN, self.PWM_FREQ)
+        self._pwm = self._gpio.PWM(self._pins.step, self.PWM_FREQ)
 
         # Détection événement capteur
         # D'abord supprimer toute détection existante (au cas où le programme a crashé)
         try:
-            gpio.remove_event_detect(self.CAPTURE_PIN)
+            self._gpio.remove_event_detect(self._pins.capture)
         except Exception:
             pass  # Ignorer si pas de détection existante
 
         try:
-            gpio.add_event_detect(
-                self.CAPTURE_PIN,
-                gpio.FALLING,
+            self._gpio.add_event_detect(
+                self._pins.capture,
+                self._gpio.FALLING,
                 bouncetime=500
             )
         except RuntimeError as e:
             print(f"[WARNING] Failed to add edge detection: {e}")
             print("[WARNING] Frame detection may not work properly")
 
-        # Caméra picamera2
-        self._camera = Picamera2()
-        config = self._camera.create_still_configuration(
-            main={"size": self.RESOLUTION}
+        self._initialized = True
+        print("GPIO initialized")
+
+    def start_camera(self) -> asyncio.Task:
+        """
+        Lance l'initialisation de la caméra en tâche de fond.
+        Le serveur répond pendant ce temps; les commandes moteur et LED
+        restent disponibles même si la caméra échoue.
+        """
+        if self._camera_task is None or self._camera_task.done():
+            self._camera_task = asyncio.get_running_loop().create_task(
+                self._initialize_camera()
+            )
+        return self._camera_task
+
+    async def _initialize_camera(self) -> None:
+        """Démarre la caméra dans un thread pour ne pas bloquer la boucle."""
+        self._camera_state = CAMERA_INITIALIZING
+        if self._mock:
+            self._camera_state = CAMERA_READY
+            return
+
+        try:
+            await asyncio.to_thread(self._open_camera)
+        except Exception as e:
+            self._camera_state = CAMERA_ERROR
+            self._last_error = f"Erreur caméra: {e}"
+            print(f"[ERROR] {self._last_error}")
+            return
+
+        self._camera_state = CAMERA_READY
+        self._queue_wakeup.set()
+        print("Camera initialized successfully")
+
+    def _open_camera(self) -> None:
+        """Ouvre et configure picamera2 (bloquant)."""
+        if self._camera_factory:
+            camera = self._camera_factory()
+        else:
+            from picamera2 import Picamera2
+            camera = Picamera2(self._camera_num)
+        # 2 buffers: la requête suivante peut démarrer pendant l'encodage
+        config = camera.create_still_configuration(
+            main={"size": self.RESOLUTION},
+            buffer_count=2,
         )
-        self._camera.configure(config)
-        self._camera.start()
+        camera.configure(config)
+        camera.start()
 
         # Récupérer la taille du capteur pour ScalerCrop
-        self._sensor_size = self._camera.camera_properties['PixelArraySize']
+        self._sensor_size = camera.camera_properties['PixelArraySize']
+        self._camera = camera
         self._update_camera_crop()
 
-        self._initialized = True
-        print("Hardware initialized successfully")
+    @property
+    def camera_state(self) -> str:
+        return self._camera_state
 
-    def cleanup(self) -> None:
+    @property
+    def camera_ready(self) -> bool:
+        return self._camera_state == CAMERA_READY
+
+    async def cleanup(self) -> None:
         """Libère les ressources GPIO et caméra."""
-        if MOCK_MODE:
+        if self._queue_task:
+            self._queue_task.cancel()
+            await asyncio.gather(self._queue_task, return_exceptions=True)
+
+        for export in self.exports.values():
+            export.cancel()
+        # Pas de processus ffmpeg orphelin après l'arrêt du service
+        await asyncio.gather(*(export.wait() for export in self.exports.values()))
+
+        if self._camera_task and not self._camera_task.done():
+            # Laisser la caméra finir de démarrer pour pouvoir la fermer proprement
+            await asyncio.wait([self._camera_task])
+
+        if self._mock:
             print("[MOCK] Hardware cleanup skipped")
             return
 
@@ -144,10 +330,15 @@ class Super8Controller:
         if self._camera:
             self._camera.stop()
             self._camera.close()
+            self._camera = None
+
+        self._gpio.output(self._pins.led, 0)
+        self._gpio.output(self._pins.enable, 1)
+        self._gpio.cleanup(self._pins.all())
 
-        gpio.output(self.LED_PIN, 0)
-        gpio.output(self.ENABLE_PIN, 1)
-        gpio.cleanup()
+        if self._trace:
+            self._trace.close()
+            self._trace = None
 
         self._initialized = False
         print("Hardware cleaned up")
@@ -157,14 +348,14 @@ class Super8Controller:
     def led_on(self) -> None:
         """Allume la LED."""
         self._led_state = True
-        if not MOCK_MODE:
-            gpio.output(self.LED_PIN, 1)
+        if not self._mock:
+            self._gpio.output(self._pins.led, 1)
 
     def led_off(self) -> None:
         """Éteint la LED."""
         self._led_state = False
-        if not MOCK_MODE:
-            gpio.output(self.LED_PIN, 0)
+        if not self._mock:
+            self._gpio.output(self._pins.led, 0)
 
     def led_toggle(self) -> bool:
         """Bascule l'état de la LED. Retourne le nouvel état."""
@@ -180,68 +371,150 @@ class Super8Controller:
 
     # =========== MOTEUR ===========
 
+    def _motor_start(self, direction: int) -> None:
+        """Active le pilote et démarre le PWM. direction: 0=AV, 1=AR."""
+        self._gpio.output(self._pins.dir, direction)
+        self._gpio.output(self._pins.enable, 0)
+        self._position.motor_started(direction, self.PWM_FREQ)
+        self._pwm.start(50)
+        if self._trace:
+            self._trace.record(hwtrace.DIRECTION, direction)
+            self._trace.record(hwtrace.PWM_START, 0, 50)
+
+    async def _motor_stop(self) -> None:
+        """
+        Arrête le moteur puis compte le front éventuel de fin de course,
+        pour que la position ne dérive pas après un arrêt.
+        """
+        self._pwm.stop()
+        stopped_at = time.monotonic()   # Plus de pas moteur après cet instant
+        self._gpio.output(self._pins.enable, 1)
+        if self._trace:
+            self._trace.record(hwtrace.PWM_STOP)
+        await asyncio.sleep(self.SETTLE_TIME)
+        self._edge_detected()
+        self._position.motor_stopped(stopped_at)
+
+    def _edge_detected(self) -> bool:
+        """
+        Front descendant du capteur de rotation depuis le dernier appel.
+        Seule source de mise à jour de la position.
+        """
+        if not self._gpio.event_detected(self._pins.capture):
+            return False
+        self._edge_time = time.monotonic()
+        self._position.edge()
+        if self._trace:
+            self._trace.record(hwtrace.EDGE, self._pins.capture)
+        return True
+
+    @property
+    def motor_busy(self) -> bool:
+        """Capture (arrêt compris) ou mouvement manuel en cours."""
+        return self._capture_active or self._manual_moves > 0
+
+    def _end_manual_move(self) -> None:
+        self._manual_moves -= 1
+        if not self._manual_moves:
+            self._queue_wakeup.set()
+
     async def advance_frames(self, n: int) -> int:
         """
         Avance de n images. Retourne le nombre d'images avancées.
-        Non-bloquant grâce à asyncio.
+        Non-bloquant grâce à asyncio. Vérifier motor_busy avant l'appel.
         """
-        if MOCK_MODE:
-            self._frame_position += n
-            await asyncio.sleep(0.1 * n)  # Simulation
-            return n
+        self._manual_moves += 1
+        try:
+            if self._mock:
+                self._position.move(n)
+                await asyncio.sleep(0.1 * n)  # Simulation
+                return n
 
-        count = 0
-        gpio.output(self.DIR_PIN, 0)  # Direction avant
-        gpio.output(self.ENABLE_PIN, 0)  # Activer moteur
-        self._pwm.start(50)
+            count = 0
+            self._motor_start(0)  # Direction avant
 
-        try:
-            while count < n:
-                if gpio.event_detected(self.CAPTURE_PIN):
-                    count += 1
-                    self._frame_position += 1
-                await asyncio.sleep(0.01)
-        finally:
-            self._pwm.stop()
-            gpio.output(self.ENABLE_PIN, 1)
+            try:
+                while count < n:
+                    if self._edge_detected():
+                        count += 1
+                    await asyncio.sleep(0.01)
+            finally:
+                await self._motor_stop()
 
-        return count
+            return count
+        finally:
+            self._end_manual_move()
 
     async def rewind_frames(self, n: int) -> int:
         """
         Recule de n images. Retourne le nombre d'images reculées.
+        Vérifier motor_busy avant l'appel.
         """
-        if MOCK_MODE:
-            self._frame_position -= n
-            await asyncio.sleep(0.1 * n)
-            return n
+        self._manual_moves += 1
+        try:
+            if self._mock:
+                self._position.move(-n)
+                await asyncio.sleep(0.1 * n)
+                return n
 
-        count = 0
-        gpio.output(self.DIR_PIN, 1)  # Direction arrière
-        gpio.output(self.ENABLE_PIN, 0)
-        self._pwm.start(50)
+            count = 0
+            self._motor_start(1)  # Direction arrière
 
-        try:
-            while count < n:
-                if gpio.event_detected(self.CAPTURE_PIN):
-                    count += 1
-                    self._frame_position -= 1
-                await asyncio.sleep(0.01)
-        finally:
-            self._pwm.stop()
-            gpio.output(self.ENABLE_PIN, 1)
+            try:
+                while count < n:
+                    if self._edge_detected():
+                        count += 1
+                    await asyncio.sleep(0.01)
+            finally:
+                await self._motor_stop()
 
-        return count
+            return count
+        finally:
+            self._end_manual_move()
 
     @property
     def frame_position(self) -> int:
-        return self._frame_position
+        return self._position.position
+
+    def set_position(self, position: int) -> int:
+        """Recalage manuel de la position."""
+        self._position.set(position)
+        return position
+
+    async def home_to_leader(self, max_frames: int = 500) -> Optional[int]:
+        """
+        Avance image par image sur l'amorce (film transparent, JPEG très léger)
+        jusqu'à la première image de film, qui devient la position 0.
+        Retourne le nombre d'images avancées, None si le film n'est pas trouvé.
+        La file de travaux attend la fin du recalage.
+        """
+        if self.motor_busy or not self.camera_ready:
+            return None
+        if self._mock:
+            self._position.set(0)
+            return 0
+
+        self._manual_moves += 1
+        try:
+            self.led_on()
+            leader_size = len(await asyncio.to_thread(self.get_preview_frame))
+            for moved in range(1, max_frames + 1):
+                if await self.advance_frames(1) == 0:
+                    break
+                size = len(await asyncio.to_thread(self.get_preview_frame))
+                if size > leader_size * self.LEADER_SIZE_RATIO:
+                    self._position.set(0)
+                    return moved
+                leader_size = min(leader_size, size)
+            return None
+        finally:
+            self._end_manual_move()
 
     # =========== CAMÉRA ===========
 
     def _update_camera_crop(self) -> None:
         """Met à jour le ScalerCrop de la caméra selon zoom/pan."""
-        if MOCK_MODE or not self._camera:
+        if self._mock or not self._camera:
             return
 
         sensor_w, sensor_h = self._sensor_size
@@ -293,7 +566,7 @@ class Super8Controller:
 
     def get_preview_frame(self) -> bytes:
         """Capture une image preview et retourne les bytes JPEG."""
-        if MOCK_MODE:
+        if self._mock:
             # Retourne une image placeholder vide
             return b''
 
@@ -303,82 +576,258 @@ class Super8Controller:
         stream.seek(0)
         return stream.read()
 
-    def capture_image(self, filepath: str) -> None:
-        """Capture une image et la sauvegarde."""
-        if MOCK_MODE:
-            print(f"[MOCK] Capture image: {filepath}")
-            return
+    async def _capture_request(self):
+        """Requête caméra dans un thread (ne bloque pas les autres machines)."""
+        t0 = time.perf_counter()
+        request = await asyncio.to_thread(self._camera.capture_request)
+        if self._trace:
+            self._trace.record(hwtrace.CAMERA, 0, time.perf_counter() - t0)
+        return request
 
-        self._camera.capture_file(filepath)
+    @staticmethod
+    def _encode_frame(request) -> tuple[bytes, int, tuple]:
+        """
+        Encode en JPEG et libère le buffer caméra (pool encodeur).
+        Retourne les données, leur empreinte blake2b 64 bits et la
+        signature de l'image pour l'index des plans.
+        """
+        from reelindex import frame_signature
+
+        stream = io.BytesIO()
+        try:
+            signature = frame_signature(request.make_array("main"))
+            request.save("main", stream, format="jpeg")
+        finally:
+            request.release()
+        data = stream.getvalue()
+        digest = hashlib.blake2b(data, digest_size=8).digest()
+        return data, int.from_bytes(digest, "little"), signature
+
+    @staticmethod
+    def _write_file(filepath: str, data: bytes) -> None:
+        with open(filepath, "wb") as f:
+            f.write(data)
+
+    async def _store_frame(self, request, filepath: str) -> tuple[int, int, tuple]:
+        """
+        Encode puis écrit une image via les pools partagés.
+        Retourne (taille, empreinte, signature).
+        """
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        data, digest, signature = await loop.run_in_executor(
+            self._pools.encoder, self._encode_frame, request
+        )
+        await loop.run_in_executor(self._pools.storage, self._write_file, filepath, data)
+        if self._trace:
+            self._trace.record(hwtrace.WRITE, len(data), time.perf_counter() - t0)
+        return len(data), digest, signature
 
     # =========== CAPTURE SÉQUENCE ===========
 
-    async def start_capture(self, n_frames: int, output_dir: str) -> None:
+    async def start_capture(
+        self,
+        n_frames: Optional[int],
+        output_dir: str,
+        start_index: int = 0,
+    ) -> str:
         """
-        Démarre une séquence de capture de n_frames images.
-        Sauvegarde dans output_dir avec format %04d.jpg.
+        Capture une séquence de n_frames images (None = jusqu'à la fin du film).
+        Sauvegarde dans output_dir avec format %04d.jpg, numérotation à partir
+        de start_index + 1 (reprise d'une bobine). Retourne la raison de fin.
         """
-        if self._capture_active:
-            return
+        if self.motor_busy:
+            return END_ERROR
 
-        self._capture_active = True
-        self._capture_target = n_frames
-        self._capture_count = 0
-        self._stop_requested = False
-        self._last_error = None
+        if not self.camera_ready:
+            self._last_error = f"Caméra non disponible ({self._camera_state})"
+            print(f"[ERROR] {self._last_error}")
+            return END_ERROR
 
+        self._capture_active = True
+        self._pools.active_captures += 1
         try:
-            # Créer le répertoire si nécessaire
-            os.makedirs(output_dir, exist_ok=True)
-        except OSError as e:
-            self._last_error = f"Erreur création répertoire: {e}"
-            self._capture_active = False
-            print(f"[ERROR] {self._last_error}")
-            return
+            self._capture_target = n_frames or 0
+            self._capture_count = 0
+            self._stop_requested = False
+            self._last_error = None
 
-        # Allumer LED
-        self.led_on()
+            try:
+                # Créer le répertoire si nécessaire
+                os.makedirs(output_dir, exist_ok=True)
+            except OSError as e:
+                self._last_error = f"Erreur création répertoire: {e}"
+                print(f"[ERROR] {self._last_error}")
+                return END_ERROR
+
+            # Allumer LED
+            self.led_on()
 
-        if MOCK_MODE:
-            # Simulation de capture - 5 secondes par image pour debug
-            while self._capture_count < n_frames and not self._stop_requested:
-                # Simuler le temps de capture (5 secondes)
-                # Diviser en petits intervalles pour permettre l'arrêt d'urgence
-                for _ in range(50):  # 50 x 0.1s = 5 secondes
-                    if self._stop_requested:
+            def remaining() -> bool:
+                return n_frames is None or self._capture_count < n_frames
+
+            # Métadonnées par image (numpy importé seulement à la première capture)
+            from framestore import FrameStore, FLAG_BLANK
+            from reelindex import ReelIndexer
+            # Nouvelle bobine (start_index == 0): on repart de zéro
+            resume = start_index > 0
+            store = FrameStore(output_dir, writable=True, truncate=not resume)
+            indexer = ReelIndexer(output_dir, resume=resume)
+            last_edge_time = 0.0
+            # Fronts datés en monotonic, convertis une seule fois en epoch
+            epoch_offset = time.time() - time.monotonic()
+
+            def record_edge(frame: int, edge_time: float, metadata: dict) -> None:
+                nonlocal last_edge_time
+                interval = edge_time - last_edge_time if last_edge_time else 0.0
+                last_edge_time = edge_time
+                store.record_edge(
+                    frame, edge_time + epoch_offset, interval,
+                    metadata.get("ExposureTime", 0),
+                    metadata.get("AnalogueGain", 0.0),
+                    metadata.get("ScalerCrop", (0, 0, 0, 0)),
+                )
+
+            reason = END_COMPLETE
+            if self._mock:
+                # Simulation de capture - 5 secondes par image pour debug
+                while remaining() and not self._stop_requested:
+                    if n_frames is None and self._capture_count >= self.MOCK_REEL_LENGTH:
+                        reason = END_OF_FILM
                         break
-                    await asyncio.sleep(0.1)
-                if not self._stop_requested:
-                    self._capture_count += 1
-                    self._frame_position += 1
-                    print(f"[MOCK] Captured frame {self._capture_count}/{n_frames}")
-        else:
-            gpio.output(self.DIR_PIN, 0)  # Direction avant
-            gpio.output(self.ENABLE_PIN, 0)
-            self._pwm.start(50)
-
-            try:
-                while self._capture_count < n_frames and not self._stop_requested:
-                    if gpio.event_detected(self.CAPTURE_PIN):
-                        # Capturer l'image
-                        filename = os.path.join(
-                            output_dir,
-                            f"{self._capture_count + 1:04d}.jpg"
-                        )
-                        self.capture_image(filename)
+                    # Simuler le temps de capture (5 secondes)
+                    # Diviser en petits intervalles pour permettre l'arrêt d'urgence
+                    for _ in range(50):  # 50 x 0.1s = 5 secondes
+                        if self._stop_requested:
+                            break
+                        await asyncio.sleep(0.1)
+                    if not self._stop_requested:
                         self._capture_count += 1
-                        self._frame_position += 1
-                    await asyncio.sleep(0.01)
-            finally:
-                self._pwm.stop()
-                gpio.output(self.ENABLE_PIN, 1)
+                        self._position.move(1)
+                        frame = start_index + self._capture_count
+                        record_edge(frame, time.monotonic(), {})
+                        store.record_file(frame, 0, 0)
+                        indexer.add(frame, *self._mock_signature(frame))
+                        self._save_progress(store.count)
+                        print(f"[MOCK] Captured frame {self._capture_count}/{n_frames}")
+            else:
+                self._motor_start(0)  # Direction avant
+
+                loop = asyncio.get_running_loop()
+                last_edge = loop.time()
+                blank_run = 0
+                size_avg = 0.0
+                stored = 0
+                # Encodage/écriture en tâche de fond, au plus MAX_PENDING_WRITES en vol
+                pending: deque[tuple[int, asyncio.Task]] = deque()
+
+                async def collect() -> bool:
+                    """
+                    Attend la plus ancienne écriture et l'enregistre.
+                    Retourne True en fin de film: images vides (JPEG très léger).
+                    """
+                    nonlocal blank_run, size_avg, stored
+                    frame, task = pending.popleft()
+                    size, digest, signature = await task
+                    stored += 1
+                    if size_avg and size < size_avg * self.BLANK_SIZE_RATIO:
+                        blank_run += 1
+                        store.record_file(frame, size, digest, FLAG_BLANK)
+                        self._save_progress(store.count)
+                        return blank_run >= self.BLANK_FRAMES
+                    blank_run = 0
+                    size_avg += (size - size_avg) / min(stored, 50)
+                    store.record_file(frame, size, digest)
+                    indexer.add(frame, *signature)
+                    self._position.save_if_due()
+                    self._save_progress(store.count)
+                    return False
+
+                try:
+                    while remaining() and not self._stop_requested:
+                        while pending and (
+                            pending[0][1].done() or len(pending) > self.MAX_PENDING_WRITES
+                        ):
+                            if await collect():
+                                reason = END_OF_FILM
+                                break
+                        if reason != END_COMPLETE:
+                            break
+
+                        if self._edge_detected():
+                            edge_time = self._edge_time
+                            last_edge = loop.time()
+                            # Capturer l'image
+                            frame = start_index + self._capture_count + 1
+                            filename = os.path.join(output_dir, f"{frame:04d}.jpg")
+                            request = await self._capture_request()
+                            record_edge(frame, edge_time, request.get_metadata())
+                            pending.append((frame, loop.create_task(
+                                self._store_frame(request, filename)
+                            )))
+                            self._capture_count += 1
+                        elif loop.time() - last_edge > self.EDGE_TIMEOUT:
+                            # Fin de film: le capteur ne voit plus défiler d'images
+                            reason = END_OF_FILM
+                            break
+                        await asyncio.sleep(0.01)
+                except OSError as e:
+                    self._last_error = f"Erreur écriture image: {e}"
+                    print(f"[ERROR] {self._last_error}")
+                    reason = END_ERROR
+                finally:
+                    await self._motor_stop()
+                    # Terminer les écritures en cours avant de rendre la main
+                    while pending:
+                        try:
+                            await collect()
+                        except OSError as e:
+                            self._last_error = f"Erreur écriture image: {e}"
+                            reason = END_ERROR
+                    if self._trace:
+                        self._trace.flush()
+
+            # Index des plans disponible dès la fin de la capture
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._pools.storage, indexer.save
+                )
+            except OSError as e:
+                self._last_error = f"Erreur écriture index: {e}"
+                print(f"[ERROR] {self._last_error}")
+
+            store.flush()
+            if self._stop_requested:
+                reason = END_STOPPED
+            return reason
+        finally:
+            # Toujours libérer l'état de capture (sinon les exports restent suspendus)
+            self._capture_active = False
+            self._pools.active_captures -= 1
 
-        self._capture_active = False
+    def _mock_signature(self, frame: int) -> tuple:
+        """Signature d'une image simulée: un aplat de couleur par plan."""
+        import numpy as np
+        from reelindex import frame_signature
+        shot = (frame - 1) // self.MOCK_SHOT_LENGTH
+        color = (shot * 85 % 256, shot * 140 % 256, shot * 50 % 256)
+        return frame_signature(np.full((*self.RESOLUTION[::-1], 3), color, dtype=np.uint8))
 
     def stop_capture(self) -> None:
-        """Arrêt d'urgence de la capture."""
+        """
+        Arrêt d'urgence de la capture. capture_active reste vrai jusqu'à
+        l'arrêt effectif du moteur, pour qu'aucun mouvement ne démarre
+        pendant que la boucle termine (et que la position reste juste).
+        """
         self._stop_requested = True
-        self._capture_active = False  # Désactiver immédiatement pour l'UI
+
+    @property
+    def capture_dir(self) -> str:
+        return self._capture_dir
+
+    @property
+    def mock_mode(self) -> bool:
+        return self._mock
 
     @property
     def capture_active(self) -> bool:
@@ -392,20 +841,216 @@ class Super8Controller:
     def capture_count(self) -> int:
         return self._capture_count
 
+    # =========== FILE DE TRAVAUX ===========
+
+    def start_queue(self) -> asyncio.Task:
+        """Lance l'exécution de la file de travaux en tâche de fond."""
+        if self._queue_task is None or self._queue_task.done():
+            self._queue_task = asyncio.get_running_loop().create_task(
+                self._run_queue()
+            )
+        return self._queue_task
+
+    def add_job(self, job: CaptureJob) -> CaptureJob:
+        self.jobs.add(job)
+        self._queue_wakeup.set()
+        return job
+
+    def run_job_now(self, job: CaptureJob) -> Optional[CaptureJob]:
+        """
+        Capture immédiate: le travail est placé en tête de file et exécuté
+        seul, même si la file est en pause (elle le reste).
+        Retourne None si une capture ou un mouvement est déjà en cours.
+        """
+        if self.motor_busy or self._immediate_job is not None:
+            return None
+        self.jobs.add(job, front=True)
+        self._immediate_job = job
+        self._queue_wakeup.set()
+        return job
+
+    def pause_queue(self) -> None:
+        """La file s'arrête après le travail en cours (changement de bobine)."""
+        self.jobs.paused = True
+        self.jobs.save()
+
+    def resume_queue(self) -> None:
+        self.jobs.paused = False
+        self.jobs.save()
+        self._queue_wakeup.set()
+
+    async def _run_queue(self) -> None:
+        """Exécute les travaux l'un après l'autre."""
+        while True:
+            job = self._immediate_job
+            if job is None and not self.jobs.paused:
+                job = self.jobs.next_pending()
+            if job is None or not self.camera_ready or self.motor_busy:
+                self._queue_wakeup.clear()
+                await self._queue_wakeup.wait()
+                continue
+
+            try:
+                await self._run_job(job, immediate=job is self._immediate_job)
+            finally:
+                if job is self._immediate_job:
+                    self._immediate_job = None
+
+    async def _run_job(self, job: CaptureJob, immediate: bool = False) -> None:
+        output_dir = job.sink or os.path.join(self._capture_dir, job.reel_id)
+        frames = None if job.frames is None else job.frames - job.frames_done
+        start_index = job.frames_done
+
+        job.state = JOB_RUNNING
+        self._current_job = job
+        self.jobs.save()
+        job.error = None
+        try:
+            # Profil compris: un jobs.json édité à la main ne doit pas tuer la file
+            self._apply_profile(job.profile)
+            reason = await self.start_capture(frames, output_dir, start_index)
+        except Exception as e:
+            # La file doit survivre à une panne (caméra, disque...)
+            reason = END_ERROR
+            job.error = f"{type(e).__name__}: {e}"
+            self._last_error = f"Erreur capture: {job.error}"
+            print(f"[ERROR] {self._last_error}")
+        finally:
+            # Conserver la progression même si la tâche est annulée
+            job.frames_done = start_index + self._capture_count
+            self._current_job = None
+            self.jobs.save()
+
+        job.end_reason = reason
+        if reason == END_STOPPED:
+            # Arrêt opérateur: le travail reprendra là où il s'est arrêté
+            job.state = JOB_PENDING
+            self.jobs.paused = True
+        elif reason == END_ERROR:
+            job.state = JOB_FAILED
+            self.jobs.paused = True
+        else:
+            job.state = JOB_DONE
+            self.led_off()
+            if self.jobs.auto_pause and not immediate:
+                self.jobs.paused = True
+        self.jobs.save()
+        print(f"Job {job.id} ({job.reel_id}): {reason}, {job.frames_done} frames")
+
+    def _save_progress(self, frames_done: int) -> None:
+        """
+        Progression du travail en cours (images écrites sans trou), sauvegardée
+        au plus toutes les JOB_SAVE_INTERVAL s: après un plantage, la reprise
+        repart de là au lieu de réécrire la bobine depuis le début.
+        """
+        job = self._current_job
+        if job is None or time.monotonic() - self._job_saved_at < self.JOB_SAVE_INTERVAL:
+            return
+        job.frames_done = frames_done
+        self.jobs.save()
+        self._job_saved_at = time.monotonic()
+
+    def reel_dir(self, reel_id: str) -> str:
+        """Répertoire de sortie d'une bobine (celui de son travail s'il existe)."""
+        for job in self.jobs.jobs:
+            if job.reel_id == reel_id and job.sink:
+                return job.sink
+        return os.path.join(self._capture_dir, reel_id)
+
+    def frame_store(self, reel_id: str):
+        """Métadonnées par image d'une bobine (lecture seule), None si absente."""
+        from framestore import FrameStore, FILENAME
+        directory = self.reel_dir(reel_id)
+        if not os.path.exists(os.path.join(directory, FILENAME)):
+            return None
+        return FrameStore(directory)
+
+    def reel_index(self, reel_id: str) -> Optional[dict]:
+        """Index des plans d'une bobine, None si absent."""
+        from reelindex import load_index
+        return load_index(self.reel_dir(reel_id))
+
+    def shot_thumbnail(self, reel_id: str, shot: int) -> Optional[str]:
+        """Chemin de la vignette d'un plan, None si absente."""
+        from reelindex import thumbnail_path
+        path = thumbnail_path(self.reel_dir(reel_id), shot)
+        return path if os.path.exists(path) else None
+
+    def split_reel(self, reel_id: str, index: dict) -> list[str]:
+        """Découpe une bobine en un répertoire par plan (bloquant)."""
+        from reelindex import split_shots
+        return split_shots(self.reel_dir(reel_id), index)
+
+    def start_export(
+        self,
+        reel_id: str,
+        fps: int,
+        shot: Optional[int] = None,
+        first: int = 1,
+        last: Optional[int] = None,
+    ):
+        """
+        Lance l'export vidéo d'une bobine (ou d'un plan découpé, voir
+        split_reel) vers <bobine>/<reel_id>[-NNN].mp4.
+        Retourne None si la bobine (ou le plan) n'a pas d'image à partir de first.
+        """
+        from export import ExportJob
+        directory = self.reel_dir(reel_id)
+        name = reel_id
+        if shot is not None:
+            from reelindex import SHOTS_DIR
+            directory = os.path.join(directory, SHOTS_DIR, f"{shot:03d}")
+            name = f"{reel_id}-{shot:03d}"
+        if not os.path.exists(os.path.join(directory, f"{first:04d}.jpg")):
+            return None
+
+        export = ExportJob(
+            directory,
+            os.path.join(self.reel_dir(reel_id), f"{name}.mp4"),
+            fps,
+            self._pools.export_slots,
+            self._pools.capture_busy,
+            first,
+            last,
+        )
+        self.exports[export.id] = export
+        export.start()
+        return export
+
+    def _apply_profile(self, profile: dict) -> None:
+        """Applique un profil de capture (zoom, pan). ValueError si invalide."""
+        # Conversion avant affectation: un profil invalide ne modifie rien
+        zoom = float(profile.get("zoom", self._zoom))
+        pan_h = float(profile.get("pan_h", self._pan_h))
+        pan_v = float(profile.get("pan_v", self._pan_v))
+        self._zoom = max(0.1, min(1.0, zoom))
+        self._pan_h = max(0.0, min(1.0, pan_h))
+        self._pan_v = max(0.0, min(1.0, pan_v))
+        self._update_camera_crop()
+
     # =========== STATUS ===========
 
     def get_status(self) -> dict:
         """Retourne l'état complet de la machine."""
         return {
+            "state": self._camera_state,    # initializing / ready / error (comme la 503)
             "led": self._led_state,
             "zoom_level": self._zoom,
             "pan_x": self._pan_h,
             "pan_y": self._pan_v,
-            "frame_position": self._frame_position,
+            "frame_position": self._position.position,
+            "position": self._position.to_dict(),
             "capture_active": self._capture_active,
             "capture_target": self._capture_target,
             "capture_count": self._capture_count,
-            "mock_mode": MOCK_MODE,
+            "camera": self._camera_state,
+            "queue": {
+                "paused": self.jobs.paused,
+                "pending": sum(j.state == JOB_PENDING for j in self.jobs.jobs),
+                "current": self._current_job.id if self._current_job else None,
+            },
+            "exports": [e.to_dict() for e in self.exports.values()],
+            "mock_mode": self._mock,
             "error": self._last_error,
         }
 
@@ -413,6 +1058,3 @@ class Super8Controller:
         """Efface la dernière erreur."""
         self._last_error = None
 
-
-# Singleton global
-controller = Super8Controller()
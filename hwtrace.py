@@ -0,0 +1,306 @@
+"""
+Enregistrement et rejeu des événements matériels de la machine Super8 Cineroll.
+
+Pendant une capture réelle, TraceRecorder écrit dans un fichier binaire compact
+les fronts capteur, les démarrages/arrêts PWM, les latences caméra et les
+latences d'écriture. ReplayGPIO et ReplayCamera rejouent ensuite ce fichier
+dans Super8Controller, à vitesse réelle ou accélérée, sans Raspberry Pi.
+
+Usage: python hwtrace.py trace.bin [--speed 10] [--frames N] [--segment N]
+"""
+
+import argparse
+import asyncio
+import os
+import struct
+import tempfile
+import time
+from typing import Optional
+
+MAGIC = b"CRTRACE1"
+
+# Enregistrement: temps (s, monotonic), type, argument, valeur
+RECORD = struct.Struct("<dBIf")
+
+# Types d'enregistrement
+EDGE = 1          # arg = broche
+PWM_START = 2     # value = rapport cyclique
+PWM_STOP = 3
+PWM_FREQ = 4      # value = fréquence
+DIRECTION = 5     # arg = 0 (AV) / 1 (AR)
+CAMERA = 6        # value = latence requête caméra (s)
+WRITE = 7         # arg = taille fichier, value = latence écriture (s)
+
+FLUSH_SIZE = 64 * 1024
+
+
+class TraceRecorder:
+    """Enregistreur bufferisé: un pack() par événement, écriture par blocs."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._buf = bytearray()
+        self._t0 = time.monotonic()
+        self.path = path
+
+    def record(self, kind: int, arg: int = 0, value: float = 0.0) -> None:
+        self._buf += RECORD.pack(time.monotonic() - self._t0, kind, arg, value)
+        if len(self._buf) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        self._file.write(self._buf)
+        self._file.flush()
+        self._buf.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+
+def read_trace(path: str) -> list[tuple[float, int, int, float]]:
+    """Lit un fichier de trace. Retourne la liste (temps, type, arg, valeur)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"Not a trace file: {path}")
+    body = data[len(MAGIC):]
+    body = body[:len(body) - len(body) % RECORD.size]
+    return list(RECORD.iter_unpack(body))
+
+
+# =========== REJEU ===========
+
+def trace_segments(records: list) -> list[tuple[int, float, list[float]]]:
+    """
+    Découpe une trace en mouvements PWM_START..PWM_STOP.
+    Retourne [(direction, durée, fronts)], temps relatifs au démarrage du
+    mouvement. Le front de fin de course (après PWM_STOP) est ramené à l'arrêt.
+    """
+    segments = []
+    direction = 0
+    for t, kind, arg, _ in records:
+        if kind == DIRECTION:
+            direction = arg
+        elif kind == PWM_START:
+            segments.append([direction, t, None, []])
+        elif segments and kind == PWM_STOP and segments[-1][2] is None:
+            segments[-1][2] = t
+        elif segments and kind == EDGE:
+            start, stop = segments[-1][1], segments[-1][2]
+            segments[-1][3].append((t if stop is None else stop) - start)
+
+    result = []
+    for direction, start, stop, edges in segments:
+        duration = stop - start if stop is not None else max(edges, default=0.0)
+        result.append((direction, duration, edges))
+    return result
+
+
+class ReplayGPIO:
+    """
+    Remplace RPi.GPIO: rejoue les fronts capteur enregistrés.
+    Seuls les mouvements en avant de la trace sont rejoués, bout à bout (ou un
+    seul avec segment); l'horloge de rejeu ne tourne que pendant le PWM.
+    """
+
+    BCM = "BCM"
+    IN = "IN"
+    OUT = "OUT"
+    FALLING = "FALLING"
+
+    def __init__(self, records: list, speed: float = 1.0, segment: Optional[int] = None):
+        self.speed = speed
+        segments = [s for s in trace_segments(records) if s[0] == 0]
+        if segment is not None:
+            segments = segments[segment:segment + 1]
+        self.segments = len(segments)
+        self._edges: list[float] = []
+        offset = 0.0
+        for _, duration, edges in segments:
+            self._edges += [offset + t for t in edges]
+            offset += duration
+        self._next = 0
+        self._elapsed = 0.0                  # Temps PWM cumulé des mouvements terminés
+        self._started: Optional[float] = None
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._edges)
+
+    def _clock(self) -> float:
+        running = time.monotonic() - self._started if self._started is not None else 0.0
+        return (self._elapsed + running) * self.speed
+
+    def setmode(self, mode) -> None:
+        pass
+
+    def setwarnings(self, flag) -> None:
+        pass
+
+    def setup(self, pin, mode) -> None:
+        pass
+
+    def output(self, pin, value) -> None:
+        pass
+
+    def add_event_detect(self, pin, edge, bouncetime=None) -> None:
+        pass
+
+    def remove_event_detect(self, pin) -> None:
+        pass
+
+    def cleanup(self, *args) -> None:
+        pass
+
+    def PWM(self, pin, freq) -> "ReplayPWM":
+        return ReplayPWM(self)
+
+    def event_detected(self, pin) -> bool:
+        # Comme RPi.GPIO: un seul événement mémorisé par appel
+        if self._next >= len(self._edges):
+            return False
+        if self._clock() >= self._edges[self._next]:
+            self._next += 1
+            return True
+        return False
+
+
+class ReplayPWM:
+    def __init__(self, replay: ReplayGPIO):
+        self._replay = replay
+
+    def start(self, duty) -> None:
+        if self._replay._started is None:
+            self._replay._started = time.monotonic()
+
+    def stop(self) -> None:
+        # Horloge de rejeu en pause tant que le moteur est arrêté
+        if self._replay._started is not None:
+            self._replay._elapsed += time.monotonic() - self._replay._started
+            self._replay._started = None
+
+    def ChangeFrequency(self, freq) -> None:
+        pass
+
+
+class ReplayCamera:
+    """Remplace Picamera2: rejoue les latences caméra et écriture enregistrées."""
+
+    def __init__(self, records: list, speed: float = 1.0):
+        self.speed = speed
+        self._camera = [r[3] for r in records if r[1] == CAMERA] or [0.0]
+        self._writes = [(r[2], r[3]) for r in records if r[1] == WRITE] or [(0, 0.0)]
+        self._index = 0
+        self.camera_properties = {"PixelArraySize": (4056, 3040)}
+
+    def create_still_configuration(self, **kwargs) -> dict:
+        return kwargs
+
+    def configure(self, config) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def set_controls(self, controls) -> None:
+        pass
+
+    def capture_file(self, output, format=None) -> None:
+        pass
+
+    def capture_request(self) -> "ReplayRequest":
+        i = self._index % len(self._camera)
+        time.sleep(self._camera[i] / self.speed)
+        write = self._writes[self._index % len(self._writes)]
+        self._index += 1
+        return ReplayRequest(write[0], write[1] / self.speed)
+
+
+class ReplayRequest:
+    def __init__(self, size: int, latency: float):
+        self._size = size
+        self._latency = latency
+
+    def save(self, name: str, output, format=None) -> None:
+        time.sleep(self._latency)
+        data = bytes(self._size)
+        if isinstance(output, str):
+            with open(output, "wb") as f:
+                f.write(data)
+        else:
+            output.write(data)
+
+    def get_metadata(self) -> dict:
+        return {}
+
+    def make_array(self, name: str):
+        import numpy as np
+        return np.zeros((576, 720, 3), dtype=np.uint8)
+
+    def release(self) -> None:
+        pass
+
+
+async def replay(
+    path: str,
+    speed: float = 1.0,
+    frames: Optional[int] = None,
+    segment: Optional[int] = None,
+) -> dict:
+    """Rejoue une trace dans un Super8Controller et mesure la boucle de capture."""
+    from hardware import Super8Controller
+
+    records = read_trace(path)
+    replay_gpio = ReplayGPIO(records, speed, segment)
+    frames = frames or replay_gpio.edge_count
+
+    with tempfile.TemporaryDirectory() as capture_dir:
+        controller = Super8Controller(
+            capture_dir,
+            gpio_backend=replay_gpio,
+            camera_factory=lambda: ReplayCamera(records, speed),
+        )
+        controller.initialize()
+        await controller.start_camera()
+
+        t0 = time.monotonic()
+        reason = await controller.start_capture(frames, os.path.join(capture_dir, "replay"))
+        elapsed = time.monotonic() - t0
+        await controller.cleanup()
+
+    return {
+        "frames": controller.capture_count,
+        "edges": replay_gpio.edge_count,
+        "segments": replay_gpio.segments,
+        "end_reason": reason,
+        "elapsed": elapsed,
+        "fps": controller.capture_count / elapsed if elapsed else 0.0,
+        "drift": controller.get_status()["position"]["drift"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rejoue une trace matérielle")
+    parser.add_argument("trace")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--frames", type=int, default=None)
+    parser.add_argument("--segment", type=int, default=None,
+                        help="Rejoue seulement le N-ième mouvement en avant (0 = premier)")
+    args = parser.parse_args()
+
+    result = asyncio.run(replay(args.trace, args.speed, args.frames, args.segment))
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+File de travaux de capture persistante pour la machine Super8 Cineroll.
+Chaque travail correspond à une bobine; la file survit aux redémarrages.
+"""
+
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field, fields
+from typing import Optional
+
+# États d'un travail
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Raisons de fin d'une séquence de capture
+END_COMPLETE = "complete"          # Nombre d'images atteint
+END_OF_FILM = "end_of_film"        # Plus de front capteur ou images vides
+END_STOPPED = "stopped"            # Arrêt opérateur
+END_ERROR = "error"
+
+
+@dataclass
+class CaptureJob:
+    """Une bobine à numériser."""
+    reel_id: str
+    frames: Optional[int] = None   # None = jusqu'à la fin du film
+    profile: dict = field(default_factory=dict)   # zoom, pan_h, pan_v
+    sink: str = ""                 # Répertoire de sortie ("" = capture_dir/reel_id)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    state: str = JOB_PENDING
+    frames_done: int = 0
+    end_reason: Optional[str] = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CaptureJob":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+class JobQueue:
+    """
+    File ordonnée de CaptureJob, sauvegardée en JSON à chaque modification.
+    Un travail interrompu (redémarrage du service) repart de frames_done.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._jobs: list[CaptureJob] = []
+        self.paused = False
+        self.auto_pause = True   # Pause après chaque bobine pour changer de bobine
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Job queue not loaded: {e}")
+            return
+
+        self.paused = data.get("paused", False)
+        self.auto_pause = data.get("auto_pause", True)
+        self._jobs = [CaptureJob.from_dict(j) for j in data.get("jobs", [])]
+        for job in self._jobs:
+            if job.state == JOB_RUNNING:
+                # Capture interrompue (plantage): pas de reprise moteur sans opérateur
+                job.state = JOB_PENDING
+                self.paused = True
+
+    def save(self) -> None:
+        """Écriture atomique (fichier temporaire puis rename)."""
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp = self._path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "paused": self.paused,
+                "auto_pause": self.auto_pause,
+                "jobs": [asdict(j) for j in self._jobs],
+            }, f, indent=1)
+        os.replace(tmp, self._path)
+
+    def add(self, job: CaptureJob, front: bool = False) -> CaptureJob:
+        """Ajoute un travail en fin de file (ou en tête: capture immédiate)."""
+        if front:
+            self._jobs.insert(0, job)
+        else:
+            self._jobs.append(job)
+        self.save()
+        return job
+
+    def remove(self, job_id: str) -> bool:
+        """Retire un travail qui n'est pas en cours."""
+        job = self.get(job_id)
+        if job is None or job.state == JOB_RUNNING:
+            return False
+        self._jobs.remove(job)
+        self.save()
+        return True
+
+    def get(self, job_id: str) -> Optional[CaptureJob]:
+        for job in self._jobs:
+            if job.id == job_id:
+                return job
+        return None
+
+    def next_pending(self) -> Optional[CaptureJob]:
+        for job in self._jobs:
+            if job.state == JOB_PENDING:
+                return job
+        return None
+
+    @property
+    def jobs(self) -> list[CaptureJob]:
+        return list(self._jobs)
+
+    def to_dict(self) -> dict:
+        return {
+            "paused": self.paused,
+            "auto_pause": self.auto_pause,
+            "jobs": [asdict(j) for j in self._jobs],
+        }
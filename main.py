@@ -1,12 +1,19 @@
 import asyncio
 from contextlib import asynccontextmanager
+from dataclasses import asdict
+from datetime import datetime
+from typing import Literal, Optional
 
-from fastapi import FastAPI, Request
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, Response
-from pydantic import BaseModel
+from fastapi.responses import (
+    FileResponse, HTMLResponse, JSONResponse, RedirectResponse, Response,
+)
+from pydantic import BaseModel, Field
 
-from hardware import controller, MOCK_MODE
+from hardware import Super8Controller
+from jobs import CaptureJob
+from units import registry
 
 
 # Modèles Pydantic
@@ -27,91 +34,330 @@ class CaptureStart(BaseModel):
     frames: int
 
 
-# Configuration
-# En mode mock, utiliser un répertoire local
-if MOCK_MODE:
-    CAPTURE_DIR = "./capture"
-else:
-    CAPTURE_DIR = "/mnt/Super8/capture"
+class PositionSet(BaseModel):
+    position: int
+
+
+class ExportStart(BaseModel):
+    fps: Literal[16, 18, 24] = 18   # Cadence réelle de la bobine
+    shot: Optional[int] = None      # Plan découpé (voir /shots/split)
+    first: int = 1
+    last: Optional[int] = None
+
+
+class CaptureProfile(BaseModel):
+    """Réglages appliqués avant la capture (absents = réglages actuels)."""
+    zoom: Optional[float] = Field(None, ge=0.1, le=1.0)
+    pan_h: Optional[float] = Field(None, ge=0.0, le=1.0)
+    pan_v: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+
+class JobCreate(BaseModel):
+    reel_id: str
+    frames: Optional[int] = None  # None = jusqu'à la fin du film
+    profile: CaptureProfile = CaptureProfile()
+    sink: str = ""
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gestion du cycle de vie de l'application."""
-    controller.initialize()
+    # GPIO seulement: la caméra démarre en tâche de fond pour que
+    # le serveur accepte les requêtes immédiatement.
+    registry.start()
     yield
-    controller.cleanup()
+    await registry.cleanup()
 
 
 app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 
 
-@app.get("/", response_class=HTMLResponse)
-async def root(request: Request):
+def get_unit(unit_id: str) -> Super8Controller:
+    """Résout la machine désignée dans l'URL."""
+    controller = registry.get(unit_id)
+    if controller is None:
+        raise HTTPException(status_code=404, detail="Machine inconnue")
+    return controller
+
+
+# Toutes les commandes machine sont sous /units/{unit_id}/...
+unit = APIRouter(prefix="/units/{unit_id}")
+
+
+def camera_unavailable(controller: Super8Controller) -> JSONResponse:
+    """Réponse 503 tant que la caméra n'est pas prête (ou en erreur)."""
+    return JSONResponse(
+        status_code=503,
+        content={"state": controller.camera_state},
+    )
+
+
+@app.get("/")
+async def root():
+    return RedirectResponse(f"/units/{registry.ids()[0]}/")
+
+
+@app.get("/units")
+async def list_units():
+    return {unit_id: registry.get(unit_id).get_status() for unit_id in registry.ids()}
+
+
+@unit.get("/", response_class=HTMLResponse)
+async def unit_page(request: Request, controller: Super8Controller = Depends(get_unit)):
     return templates.TemplateResponse("index.html", {
         "request": request,
+        "base": f"/units/{request.path_params['unit_id']}",
+        "units": registry.ids(),
         "led": controller.led_state,
-        "mock_mode": MOCK_MODE
+        "mock_mode": controller.mock_mode
     })
 
 
-@app.get("/status")
-async def get_status():
+@unit.get("/status")
+async def get_status(controller: Super8Controller = Depends(get_unit)):
     return controller.get_status()
 
 
-@app.post("/led")
-async def toggle_led():
+@unit.post("/led")
+async def toggle_led(controller: Super8Controller = Depends(get_unit)):
     state = controller.led_toggle()
     return {"led": state}
 
 
-@app.post("/advance")
-async def advance_frames(action: FrameAction):
+@unit.post("/advance")
+async def advance_frames(action: FrameAction, controller: Super8Controller = Depends(get_unit)):
+    # Vérification et démarrage sans await intermédiaire: pas de mouvement concurrent
+    if controller.motor_busy:
+        raise HTTPException(status_code=409, detail="Moteur occupé")
     await controller.advance_frames(action.frames)
     return {"frame_position": controller.frame_position}
 
 
-@app.post("/rewind")
-async def rewind_frames(action: FrameAction):
+@unit.post("/rewind")
+async def rewind_frames(action: FrameAction, controller: Super8Controller = Depends(get_unit)):
+    if controller.motor_busy:
+        raise HTTPException(status_code=409, detail="Moteur occupé")
     await controller.rewind_frames(action.frames)
     return {"frame_position": controller.frame_position}
 
 
-@app.post("/zoom")
-async def adjust_zoom(action: ZoomAction):
+@unit.get("/position")
+async def get_position(controller: Super8Controller = Depends(get_unit)):
+    return controller.get_status()["position"]
+
+
+@unit.post("/position")
+async def set_position(action: PositionSet, controller: Super8Controller = Depends(get_unit)):
+    """Recalage manuel: l'image devant la fenêtre prend ce numéro."""
+    controller.set_position(action.position)
+    return controller.get_status()["position"]
+
+
+@unit.post("/position/home")
+async def home_position(controller: Super8Controller = Depends(get_unit)):
+    """Recalage sur la fin de l'amorce (position 0)."""
+    if controller.motor_busy:
+        raise HTTPException(status_code=409, detail="Moteur occupé")
+    moved = await controller.home_to_leader()
+    if moved is None:
+        raise HTTPException(status_code=409, detail="Début du film non trouvé")
+    return {"moved": moved, **controller.get_status()["position"]}
+
+
+@unit.post("/zoom")
+async def adjust_zoom(action: ZoomAction, controller: Super8Controller = Depends(get_unit)):
     zoom = controller.set_zoom(action.direction)
     return {"zoom_level": zoom}
 
 
-@app.post("/pan")
-async def adjust_pan(action: PanAction):
+@unit.post("/pan")
+async def adjust_pan(action: PanAction, controller: Super8Controller = Depends(get_unit)):
     pan_h, pan_v = controller.set_pan(action.x, action.y)
     return {"pan_x": pan_h, "pan_y": pan_v}
 
 
-@app.post("/capture/start")
-async def start_capture(action: CaptureStart):
-    # Lancer la capture en tâche de fond
-    loop = asyncio.get_event_loop()
-    loop.create_task(
-        controller.start_capture(action.frames, CAPTURE_DIR)
-    )
+@unit.post("/capture/start")
+async def start_capture(action: CaptureStart, controller: Super8Controller = Depends(get_unit)):
+    if not controller.camera_ready:
+        return camera_unavailable(controller)
+    # Capture immédiate = un travail exécuté seul, en tête de file
+    job = controller.run_job_now(CaptureJob(
+        reel_id=datetime.now().strftime("%Y%m%d-%H%M%S"),
+        frames=action.frames,
+        sink=controller.capture_dir,
+    ))
+    if job is None:
+        raise HTTPException(status_code=409, detail="Capture ou mouvement en cours")
     # Petite pause pour laisser la tâche démarrer
     await asyncio.sleep(0.1)
     return controller.get_status()
 
 
-@app.post("/capture/stop")
-async def stop_capture():
+@unit.post("/capture/stop")
+async def stop_capture(controller: Super8Controller = Depends(get_unit)):
     controller.stop_capture()
     return {"capture_active": controller.capture_active}
 
 
-@app.get("/image")
-async def get_image():
-    if MOCK_MODE:
+@unit.get("/jobs")
+async def list_jobs(controller: Super8Controller = Depends(get_unit)):
+    return controller.jobs.to_dict()
+
+
+@unit.post("/jobs")
+async def add_job(action: JobCreate, controller: Super8Controller = Depends(get_unit)):
+    job = controller.add_job(CaptureJob(**action.model_dump(exclude_none=True)))
+    return asdict(job)
+
+
+@unit.delete("/jobs/{job_id}")
+async def remove_job(job_id: str, controller: Super8Controller = Depends(get_unit)):
+    if not controller.jobs.remove(job_id):
+        raise HTTPException(status_code=404, detail="Travail introuvable ou en cours")
+    return controller.jobs.to_dict()
+
+
+@unit.post("/jobs/pause")
+async def pause_jobs(controller: Super8Controller = Depends(get_unit)):
+    controller.pause_queue()
+    return controller.jobs.to_dict()
+
+
+@unit.post("/jobs/resume")
+async def resume_jobs(controller: Super8Controller = Depends(get_unit)):
+    controller.resume_queue()
+    return controller.jobs.to_dict()
+
+
+def get_frame_store(reel_id: str, controller: Super8Controller = Depends(get_unit)):
+    store = controller.frame_store(reel_id)
+    if store is None:
+        raise HTTPException(status_code=404, detail="Bobine inconnue")
+    return store
+
+
+@unit.get("/reels/{reel_id}/frames")
+async def reel_frames(
+    first: int = 1,
+    last: Optional[int] = None,
+    fields: Optional[str] = None,
+    store=Depends(get_frame_store),
+):
+    """
+    Métadonnées des images first..last, par pages de framestore.MAX_PAGE images
+    (fields: liste séparée par des virgules).
+    """
+    try:
+        return store.frames(first, last, fields.split(",") if fields else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@unit.get("/reels/{reel_id}/frames/histogram")
+async def reel_histogram(
+    field: str = "interval",
+    first: int = 1,
+    last: Optional[int] = None,
+    bins: int = 50,
+    store=Depends(get_frame_store),
+):
+    try:
+        return store.histogram(field, first, last, bins)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@unit.get("/reels/{reel_id}/frames/stats")
+async def reel_stats(
+    field: str = "interval",
+    first: int = 1,
+    last: Optional[int] = None,
+    store=Depends(get_frame_store),
+):
+    try:
+        return store.stats(field, first, last)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_reel_index(reel_id: str, controller: Super8Controller = Depends(get_unit)) -> dict:
+    index = controller.reel_index(reel_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Index de bobine absent")
+    return index
+
+
+@unit.get("/reels/{reel_id}/shots")
+async def reel_shots(index: dict = Depends(get_reel_index)):
+    return index
+
+
+@unit.get("/reels/{reel_id}/shots/{shot}/thumbnail")
+async def shot_thumbnail(
+    reel_id: str,
+    shot: int,
+    controller: Super8Controller = Depends(get_unit),
+):
+    path = controller.shot_thumbnail(reel_id, shot)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Vignette absente")
+    return FileResponse(path, media_type="image/jpeg")
+
+
+@unit.post("/reels/{reel_id}/shots/split")
+async def split_reel(
+    reel_id: str,
+    controller: Super8Controller = Depends(get_unit),
+    index: dict = Depends(get_reel_index),
+):
+    """Un répertoire par plan (liens vers les images de la bobine)."""
+    directories = await asyncio.to_thread(controller.split_reel, reel_id, index)
+    return {"shots": directories}
+
+
+@unit.post("/reels/{reel_id}/export")
+async def start_export(
+    reel_id: str,
+    action: ExportStart,
+    controller: Super8Controller = Depends(get_unit),
+):
+    """Export vidéo en tâche de fond; suivre via /exports/{id} ou /status."""
+    export = controller.start_export(
+        reel_id, action.fps, action.shot, action.first, action.last
+    )
+    if export is None:
+        raise HTTPException(status_code=404, detail="Bobine ou plan sans images")
+    return export.to_dict()
+
+
+@unit.get("/exports")
+async def list_exports(controller: Super8Controller = Depends(get_unit)):
+    return [e.to_dict() for e in controller.exports.values()]
+
+
+@unit.get("/exports/{export_id}")
+async def get_export(export_id: str, controller: Super8Controller = Depends(get_unit)):
+    export = controller.exports.get(export_id)
+    if export is None:
+        raise HTTPException(status_code=404, detail="Export inconnu")
+    return export.to_dict()
+
+
+@unit.delete("/exports/{export_id}")
+async def cancel_export(export_id: str, controller: Super8Controller = Depends(get_unit)):
+    export = controller.exports.get(export_id)
+    if export is None:
+        raise HTTPException(status_code=404, detail="Export inconnu")
+    export.cancel()
+    return export.to_dict()
+
+
+@unit.get("/image")
+async def get_image(controller: Super8Controller = Depends(get_unit)):
+    if not controller.camera_ready:
+        return camera_unavailable(controller)
+    if controller.mock_mode:
         # Mode développement: inclure tous les paramètres pour forcer le rechargement
         # quand frame, zoom ou pan changent
         return {
@@ -122,3 +368,6 @@ async def get_image():
         # Mode réel: retourne l'image caméra
         frame = controller.get_preview_frame()
         return Response(content=frame, media_type="image/jpeg")
+
+
+app.include_router(unit)
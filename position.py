@@ -0,0 +1,122 @@
+"""
+Position absolue du film (numéro d'image) pour la machine Super8 Cineroll.
+
+La position n'est modifiée que par les fronts du capteur de rotation, dans le
+sens du moteur. Elle est sauvegardée en fin de mouvement (et au plus toutes
+les SAVE_INTERVAL secondes pendant une capture), donc survit aux redémarrages.
+La dérive compare les fronts comptés aux images attendues d'après le nombre
+de pas moteur (fréquence PWM x durée) depuis la dernière mise à zéro.
+"""
+
+import json
+import os
+import time
+from typing import Optional
+
+SAVE_INTERVAL = 2.0
+
+
+class PositionTracker:
+    """Compteur d'images persistant, avec suivi de dérive."""
+
+    def __init__(self, path: str, steps_per_frame: int):
+        self._path = path
+        self.steps_per_frame = steps_per_frame
+        self.position = 0
+        self.homed = False          # Position recalée (amorce ou manuelle)
+        self._direction = 1
+        self._counted = 0           # Fronts depuis le recalage
+        self._expected = 0.0        # Images attendues depuis le recalage
+        self._move_counted = 0
+        self._move_expected = 0.0
+        self._move_start: Optional[float] = None
+        self._freq = 0.0
+        self._saved_at = 0.0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Position not loaded: {e}")
+            return
+        self.position = data.get("position", 0)
+        self.homed = data.get("homed", False)
+        self._counted = data.get("counted", 0)
+        self._expected = data.get("expected", 0.0)
+
+    def save(self) -> None:
+        """Écriture atomique (fichier temporaire puis rename)."""
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp = self._path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "position": self.position,
+                "homed": self.homed,
+                "counted": self._counted,
+                "expected": self._expected,
+            }, f)
+        os.replace(tmp, self._path)
+        self._saved_at = time.monotonic()
+
+    def save_if_due(self) -> None:
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    # =========== MOUVEMENT ===========
+
+    def motor_started(self, direction: int, freq: float) -> None:
+        """direction: 0=AV, 1=AR (comme la broche DIR)."""
+        self._direction = -1 if direction else 1
+        self._freq = freq
+        self._move_start = time.monotonic()
+        self._move_counted = 0
+
+    def edge(self) -> None:
+        """Un front capteur: une image dans le sens du moteur."""
+        self.position += self._direction
+        self._move_counted += 1
+
+    def motor_stopped(self, stopped_at: float) -> None:
+        """
+        stopped_at: time.monotonic() à l'arrêt du PWM. Appelé après la
+        stabilisation, une fois le dernier front compté.
+        """
+        if self._move_start is not None:
+            steps = self._freq * (stopped_at - self._move_start)
+            self._move_expected = steps / self.steps_per_frame
+            self._expected += self._move_expected
+            self._counted += self._move_counted
+            self._move_start = None
+        self.save()
+
+    def move(self, frames: int) -> None:
+        """Déplacement simulé (mode mock): pas de pas moteur à comparer."""
+        self.position += frames
+        self.save_if_due()
+
+    # =========== RECALAGE ===========
+
+    def set(self, position: int) -> None:
+        """Recale la position (amorce détectée ou saisie manuelle)."""
+        self.position = position
+        self.homed = True
+        self._counted = 0
+        self._expected = 0.0
+        self.save()
+
+    def to_dict(self) -> dict:
+        return {
+            "position": self.position,
+            "homed": self.homed,
+            "counted": self._counted,
+            "expected": round(self._expected, 2),
+            "drift": round(self._counted - self._expected, 2),
+            "last_move": {
+                "counted": self._move_counted,
+                "expected": round(self._move_expected, 2),
+            },
+        }
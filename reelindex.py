@@ -0,0 +1,173 @@
+"""
+Index des plans d'une bobine, construit pendant la capture.
+
+Chaque image capturée donne une signature (histogramme couleur normalisé et
+vignette sous-échantillonnée) calculée dans le pool d'encodage. ReelIndexer
+reçoit ces signatures dans l'ordre des images, détecte les changements de
+plan et écrit <bobine>/index.json et une vignette par plan en fin de capture:
+aucune relecture des JPEG n'est nécessaire.
+"""
+
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+BINS = 16                   # Classes par canal (puissance de 2)
+SUBSAMPLE = 4               # Un pixel sur 4 en x et en y pour l'histogramme
+THUMB_STEP = 8              # Vignette: un pixel sur 8 (90x72 pour 720x576)
+CUT_THRESHOLD = 0.35        # Distance minimale entre deux images pour une coupe
+CUT_RATIO = 4.0             # ... et supérieure à CUT_RATIO x la distance moyenne du plan
+
+INDEX_FILE = "index.json"
+THUMB_DIR = "index"
+SHOTS_DIR = "shots"
+
+_SHIFT = 8 - (BINS.bit_length() - 1)
+_OFFSETS = np.array([0, BINS, 2 * BINS], dtype=np.intp)
+
+
+def frame_signature(rgb: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Histogramme couleur (3 x BINS classes, somme 1 par canal) et vignette
+    d'une image RGB uint8 (H, W, 3).
+    """
+    pixels = rgb[::SUBSAMPLE, ::SUBSAMPLE, :3].reshape(-1, 3) >> _SHIFT
+    counts = np.bincount((pixels + _OFFSETS).ravel(), minlength=3 * BINS)
+    hist = counts.astype(np.float32) / max(len(pixels), 1)
+    thumb = np.ascontiguousarray(rgb[::THUMB_STEP, ::THUMB_STEP, :3])
+    return hist, thumb
+
+
+def _distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Distance L1 normalisée entre deux histogrammes (0 = identiques, 1 = disjoints)."""
+    return float(np.abs(a - b).sum()) / 6.0
+
+
+class ReelIndexer:
+    """Détection incrémentale des plans d'une bobine."""
+
+    def __init__(self, directory: str, resume: bool = False):
+        self._directory = directory
+        self.shots: list[dict] = []
+        self._prev: Optional[np.ndarray] = None
+        self._mean: Optional[np.ndarray] = None     # Histogramme moyen du plan en cours
+        self._mean_distance = 0.0
+        self._best = float("inf")                   # Écart de la vignette au plan moyen
+        self._thumbs: dict[int, np.ndarray] = {}    # Vignettes non encore écrites
+
+        index = load_index(directory) if resume else None
+        if index:
+            # Reprise d'une bobine: le dernier plan continue
+            self.shots = index["shots"]
+            if self.shots:
+                self._mean = np.array(self.shots[-1].pop("signature"), dtype=np.float32)
+
+    def add(self, frame: int, hist: np.ndarray, thumb: np.ndarray) -> None:
+        """Ajoute la signature de l'image n° frame (appel dans l'ordre des images)."""
+        shot = self.shots[-1] if self.shots else None
+        distance = _distance(hist, self._prev) if self._prev is not None else 0.0
+        self._prev = hist
+
+        if shot is None or (
+            distance > CUT_THRESHOLD and distance > CUT_RATIO * self._mean_distance
+        ):
+            self._open_shot(frame, hist, thumb)
+            return
+
+        # Moyennes incrémentales du plan en cours
+        n = shot["last"] - shot["first"] + 1
+        shot["last"] = frame
+        self._mean += (hist - self._mean) / (n + 1)
+        self._mean_distance += (distance - self._mean_distance) / n
+
+        # Vignette: l'image la plus proche de l'histogramme moyen du plan
+        gap = _distance(hist, self._mean)
+        if gap < self._best:
+            self._best = gap
+            shot["thumbnail"] = frame
+            self._thumbs[len(self.shots)] = thumb
+
+    def _open_shot(self, frame: int, hist: np.ndarray, thumb: np.ndarray) -> None:
+        self.shots.append({
+            "shot": len(self.shots) + 1,
+            "first": frame,
+            "last": frame,
+            "thumbnail": frame,
+        })
+        self._mean = hist.copy()
+        self._mean_distance = 0.0
+        self._best = float("inf")
+        self._thumbs[len(self.shots)] = thumb
+
+    def save(self) -> dict:
+        """Écrit les vignettes en attente et index.json (pool d'écriture)."""
+        from PIL import Image
+
+        thumb_dir = os.path.join(self._directory, THUMB_DIR)
+        os.makedirs(thumb_dir, exist_ok=True)
+        for shot, thumb in self._thumbs.items():
+            Image.fromarray(thumb).save(os.path.join(thumb_dir, f"shot-{shot:03d}.jpg"))
+        self._thumbs.clear()
+
+        shots = [dict(s) for s in self.shots]
+        if shots and self._mean is not None:
+            # Pour reprendre le dernier plan après une interruption
+            shots[-1]["signature"] = self._mean.tolist()
+        index = {"frames": shots[-1]["last"] if shots else 0, "shots": shots}
+        tmp = os.path.join(self._directory, INDEX_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, os.path.join(self._directory, INDEX_FILE))
+        return index
+
+
+def load_index(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def thumbnail_path(directory: str, shot: int) -> str:
+    return os.path.join(directory, THUMB_DIR, f"shot-{shot:03d}.jpg")
+
+
+def split_shots(directory: str, index: dict) -> list[str]:
+    """
+    Découpe une bobine en un répertoire par plan (shots/NNN/%04d.jpg, numérotés
+    à partir de 1) avec des liens physiques: aucune copie d'image.
+    Les images absentes de la bobine sont ignorées (numérotation continue).
+    Retourne les répertoires créés.
+    """
+    result = []
+    for shot in index["shots"]:
+        shot_dir = os.path.join(directory, SHOTS_DIR, f"{shot['shot']:03d}")
+        os.makedirs(shot_dir, exist_ok=True)
+        n = 0
+        missing = 0
+        for frame in range(shot["first"], shot["last"] + 1):
+            src = os.path.join(directory, f"{frame:04d}.jpg")
+            if not os.path.exists(src):
+                missing += 1
+                continue
+            n += 1
+            dst = os.path.join(shot_dir, f"{n:04d}.jpg")
+            # lexists: un lien symbolique cassé d'un découpage précédent
+            if os.path.lexists(dst):
+                os.remove(dst)
+            try:
+                os.link(src, dst)
+            except OSError:
+                os.symlink(os.path.abspath(src), dst)
+        # Images d'un découpage précédent plus long
+        n += 1
+        while os.path.lexists(os.path.join(shot_dir, f"{n:04d}.jpg")):
+            os.remove(os.path.join(shot_dir, f"{n:04d}.jpg"))
+            n += 1
+        if missing:
+            print(f"[WARNING] Shot {shot['shot']}: {missing} missing frame(s) skipped")
+        result.append(shot_dir)
+    return result
@@ -0,0 +1,103 @@
+"""
+Registre des machines Super8 pilotées par le service.
+Chaque machine a sa configuration GPIO, sa caméra, son répertoire de capture
+et sa file de travaux; les pools d'encodage et d'écriture sont partagés.
+"""
+
+import json
+import os
+from typing import Iterator, Optional
+
+from hardware import CAPTURE_DIR, PinMap, Super8Controller, WorkerPools
+
+DEFAULT_UNIT = "super8"
+
+
+class ControllerRegistry:
+    """Ensemble de Super8Controller indexés par identifiant de machine."""
+
+    def __init__(self, pools: Optional[WorkerPools] = None):
+        self.pools = pools or WorkerPools()
+        self._units: dict[str, Super8Controller] = {}
+
+    def add(
+        self,
+        unit_id: str,
+        capture_dir: Optional[str] = None,
+        pins: Optional[dict] = None,
+        camera: int = 0,
+        simulate: bool = False,
+        steps_per_frame: Optional[int] = None,
+        trace_dir: Optional[str] = None,
+    ) -> Super8Controller:
+        if unit_id in self._units:
+            raise ValueError(f"Unit already registered: {unit_id}")
+        controller = Super8Controller(
+            capture_dir or os.path.join(CAPTURE_DIR, unit_id),
+            pins=PinMap(**(pins or {})),
+            camera_num=camera,
+            pools=self.pools,
+            simulate=simulate,
+            steps_per_frame=steps_per_frame,
+            trace_dir=trace_dir and os.path.join(trace_dir, unit_id),
+        )
+        self._units[unit_id] = controller
+        return controller
+
+    @classmethod
+    def from_config(cls, path: str, trace_dir: Optional[str] = None) -> "ControllerRegistry":
+        """
+        Charge la liste des machines depuis un fichier JSON:
+        {"units": [{"id": "a", "camera": 0, "capture_dir": "...",
+                    "pins": {"step": 18, ...}, "steps_per_frame": 3200,
+                    "simulate": false}]}
+        Sans fichier, une seule machine avec la configuration par défaut.
+        """
+        registry = cls()
+        try:
+            with open(path) as f:
+                units = json.load(f)["units"]
+        except FileNotFoundError:
+            registry.add(DEFAULT_UNIT, capture_dir=CAPTURE_DIR, trace_dir=trace_dir)
+            return registry
+
+        for unit in units:
+            registry.add(
+                unit["id"],
+                capture_dir=unit.get("capture_dir"),
+                pins=unit.get("pins"),
+                camera=unit.get("camera", 0),
+                simulate=unit.get("simulate", False),
+                steps_per_frame=unit.get("steps_per_frame"),
+                trace_dir=trace_dir,
+            )
+        return registry
+
+    def get(self, unit_id: str) -> Optional[Super8Controller]:
+        return self._units.get(unit_id)
+
+    def ids(self) -> list[str]:
+        return list(self._units)
+
+    def __iter__(self) -> Iterator[Super8Controller]:
+        return iter(self._units.values())
+
+    def start(self) -> None:
+        """GPIO de toutes les machines, puis caméras et files en tâche de fond."""
+        for controller in self:
+            controller.initialize()
+        for controller in self:
+            controller.start_camera()
+            controller.start_queue()
+
+    async def cleanup(self) -> None:
+        for controller in self:
+            await controller.cleanup()
+        self.pools.shutdown()
+
+
+# Registre global
+registry = ControllerRegistry.from_config(
+    os.environ.get("CINEROLL_UNITS", "units.json"),
+    trace_dir=os.environ.get("CINEROLL_TRACE_DIR"),
+)